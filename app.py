@@ -1,7 +1,16 @@
+import time
 import streamlit as st
 import pandas as pd
+from contextlib import contextmanager
 from io import BytesIO
-from processor import procesar_reportes
+from processor import (
+    procesar_reportes,
+    preparar_ventas,
+    preparar_performance,
+    preparar_auditorias,
+)
+
+inicio_script = time.perf_counter()
 
 
 # ---------------------------------------------------------
@@ -105,61 +114,196 @@ def generar_excel(resultados):
 
 
 # ---------------------------------------------------------
-# ENTRADA DE FECHAS
+# LATENCIA POR SECCIÓN
+# ---------------------------------------------------------
+@contextmanager
+def medir(seccion):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        st.session_state.setdefault("latencias", {})[seccion] = (time.perf_counter() - inicio) * 1000
+
+
+def mostrar_latencia(seccion):
+    ms = st.session_state.get("latencias", {}).get(seccion)
+    if ms is not None:
+        st.caption(f"⏱️ {seccion}: {ms:,.0f} ms")
+
+
+# ---------------------------------------------------------
+# ENTRADA DE FECHAS (formulario: solo se aplica al enviar)
 # ---------------------------------------------------------
 st.header("📅 Seleccionar rango de fechas")
 
-col1, col2 = st.columns(2)
-with col1:
-    fecha_inicio = st.date_input("Fecha inicio")
-with col2:
-    fecha_fin = st.date_input("Fecha término")
+with st.form("rango_fechas"):
+    col1, col2 = st.columns(2)
+    with col1:
+        fecha_inicio = st.date_input("Fecha inicio")
+    with col2:
+        fecha_fin = st.date_input("Fecha término")
+    st.form_submit_button("Aplicar rango")
 
 if fecha_inicio > fecha_fin:
     st.error("⚠️ La fecha de inicio no puede ser mayor que la de término.")
     st.stop()
 
+st.session_state["rango"] = (fecha_inicio, fecha_fin)
+
 
 # ---------------------------------------------------------
-# CARGA DE ARCHIVOS
+# CARGA DE ARCHIVOS (cada archivo se parsea una sola vez)
 # ---------------------------------------------------------
-st.header("📂 Cargar archivos")
+ARCHIVOS = {
+    "ventas": "Ventas (CSV o Excel)",
+    "performance": "Performance (CSV o Excel)",
+    "auditorias": "Auditorías (CSV o Excel)",
+    "agentes": "Agentes (CSV o Excel)",
+}
+
+PREPARAR = {
+    "ventas": preparar_ventas,
+    "performance": preparar_performance,
+    "auditorias": preparar_auditorias,
+}
 
-ventas_file      = st.file_uploader("Ventas (CSV o Excel)", type=["csv", "xlsx"])
-performance_file = st.file_uploader("Performance (CSV o Excel)", type=["csv", "xlsx"])
-auditorias_file  = st.file_uploader("Auditorías (CSV o Excel)", type=["csv", "xlsx"])
-agentes_file     = st.file_uploader("Agentes (CSV o Excel)", type=["csv", "xlsx"])
 
-df_ventas      = cargar_archivo(ventas_file)
-df_performance = cargar_archivo(performance_file)
-df_auditorias  = cargar_archivo(auditorias_file)
-df_agentes     = cargar_archivo(agentes_file)
+def actualizar_fuente(clave, f):
+    fuentes = st.session_state.setdefault("fuentes", {})
+
+    if f is None:
+        return fuentes.pop(clave, None) is not None
+
+    # Mismo archivo que en la ejecución anterior: no se vuelve a parsear
+    if clave in fuentes and fuentes[clave][0] == f.file_id:
+        return False
+
+    df = cargar_archivo(f)
+    error = None if df is not None else f"❌ No se pudo leer {f.name}."
+
+    # Fuentes con fecha: se indexan una vez; cada rango luego es solo un corte
+    if df is not None and clave in PREPARAR:
+        try:
+            df = PREPARAR[clave](df)
+        except Exception as e:
+            error = f"❌ Error preparando {f.name}: {e}"
+            df = None
+
+    # El error queda junto al archivo: se muestra en cada render, no solo al subirlo
+    fuentes[clave] = (f.file_id, df, error)
+    return True
+
+
+def fuente(clave):
+    return st.session_state.get("fuentes", {}).get(clave, (None, None, None))[1]
+
+
+def error_fuente(clave):
+    return st.session_state.get("fuentes", {}).get(clave, (None, None, None))[2]
+
+
+def entradas_actuales():
+    fuentes = st.session_state.get("fuentes", {})
+    return (
+        st.session_state.get("rango"),
+        tuple(fuentes.get(clave, (None, None, None))[0] for clave in ARCHIVOS),
+    )
+
+
+def resultados_vigentes():
+    """Resultados del último proceso, solo si el rango y los archivos no cambiaron."""
+
+    if "resultados" not in st.session_state:
+        return None
+
+    if st.session_state.get("resultados_para") != entradas_actuales():
+        for clave in ("resultados", "excel", "resultados_para"):
+            st.session_state.pop(clave, None)
+        st.session_state["desactualizado"] = True
+        return None
+
+    return st.session_state["resultados"]
+
+
+@st.fragment
+def seccion_carga():
+    st.header("📂 Cargar archivos")
+
+    cambio = False
+    with medir("Carga"):
+        for clave, etiqueta in ARCHIVOS.items():
+            f = st.file_uploader(etiqueta, type=["csv", "xlsx"], key=f"archivo_{clave}")
+            cambio = actualizar_fuente(clave, f) or cambio
+            if error_fuente(clave):
+                st.error(error_fuente(clave))
+
+    mostrar_latencia("Carga")
+
+    # Archivo nuevo o quitado: los reportes mostrados ya no corresponden
+    if cambio and "resultados" in st.session_state:
+        st.rerun()
 
 
 # ---------------------------------------------------------
 # BOTÓN PARA PROCESAR
 # ---------------------------------------------------------
-st.header("⚙️ Generar Reportes")
+@st.fragment
+def seccion_proceso():
+    st.header("⚙️ Generar Reportes")
 
-if st.button("Procesar"):
+    if st.button("Procesar"):
 
-    if df_ventas is None or df_performance is None or df_auditorias is None or df_agentes is None:
-        st.error("⚠️ Debes cargar todos los archivos para continuar.")
-        st.stop()
+        errores = [error_fuente(clave) for clave in ARCHIVOS if error_fuente(clave)]
+        if errores:
+            for error in errores:
+                st.error(error)
+            return
 
-    try:
-        resultados = procesar_reportes(
-            df_ventas,
-            df_performance,
-            df_auditorias,
-            df_agentes,
-            fecha_inicio,
-            fecha_fin
-        )
+        if any(fuente(clave) is None for clave in ARCHIVOS):
+            st.error("⚠️ Debes cargar todos los archivos para continuar.")
+            return
+
+        fecha_inicio, fecha_fin = st.session_state["rango"]
+
+        try:
+            with medir("Proceso"):
+                resultados = procesar_reportes(
+                    fuente("ventas"),
+                    fuente("performance"),
+                    fuente("auditorias"),
+                    fuente("agentes"),
+                    fecha_inicio,
+                    fecha_fin
+                )
+        except Exception as e:
+            st.error(f"❌ Error al procesar: {e}")
+            return
+
+        st.session_state["resultados"] = resultados
+        st.session_state["resultados_para"] = entradas_actuales()
+        st.session_state.pop("excel", None)
+        st.session_state.pop("desactualizado", None)
 
+        # Refrescar resultados y descarga con los nuevos reportes
+        st.rerun()
+
+    mostrar_latencia("Proceso")
+
+
+# ---------------------------------------------------------
+# RESULTADOS
+# ---------------------------------------------------------
+@st.fragment
+def seccion_resultados():
+    resultados = resultados_vigentes()
+    if resultados is None:
+        if st.session_state.get("desactualizado"):
+            st.warning("⚠️ Resultados desactualizados: cambió el rango o los archivos. Vuelve a procesar.")
+        return
+
+    with medir("Resultados"):
         st.success("✅ Reportes generados correctamente.")
 
-        # Mostrar tablas
         st.subheader("📅 Reporte Diario")
         st.dataframe(resultados["diario"], use_container_width=True)
 
@@ -169,16 +313,36 @@ if st.button("Procesar"):
         st.subheader("📊 Resumen por Supervisor")
         st.dataframe(resultados["resumen"], use_container_width=True)
 
-        # Descargar Excel
-        excel_bytes = generar_excel(resultados)
+    mostrar_latencia("Resultados")
+
+
+# ---------------------------------------------------------
+# DESCARGA (el Excel se genera una vez por resultado)
+# ---------------------------------------------------------
+@st.fragment
+def seccion_descarga():
+    resultados = resultados_vigentes()
+    if resultados is None:
+        return
+
+    with medir("Descarga"):
+        if "excel" not in st.session_state:
+            st.session_state["excel"] = generar_excel(resultados)
 
         st.download_button(
             label="⬇️ Descargar Excel (3 hojas)",
-            data=excel_bytes,
+            data=st.session_state["excel"],
             file_name="CMI_Aeropuerto_Reporte.xlsx",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         )
 
-    except Exception as e:
-        st.error(f"❌ Error al procesar: {e}")
+    mostrar_latencia("Descarga")
+
+
+seccion_carga()
+seccion_proceso()
+seccion_resultados()
+seccion_descarga()
 
+st.session_state.setdefault("latencias", {})["Script"] = (time.perf_counter() - inicio_script) * 1000
+mostrar_latencia("Script")
@@ -1,6 +1,13 @@
+import json
+import os
+import weakref
+import multiprocessing as mp
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+import pyarrow as pa
+import pyarrow.compute as pc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
 
 # =========================================================
 #   FUNCIÓN DE FECHA — VERSIÓN FINAL (ROBUSTA LATAM)
@@ -79,30 +86,137 @@ def filtrar_rango(df, col, d_from, d_to):
     return df
 
 
+# =========================================================
+#   ÍNDICE POR FECHA — fuentes parseadas una sola vez
+# =========================================================
+
+def dia_ordinal(d):
+    """Días desde 1970-01-01, como int32 igual que la columna "dia" (con otro
+       tipo, searchsorted convierte el arreglo completo en cada llamada)."""
+    return np.int32(np.datetime64(d, "D").astype(np.int64))
+
+
+# Frames con "dia" ya verificado como ordenado (por identidad, no por attrs)
+_ORDENADOS = weakref.WeakValueDictionary()
+
+
+def marcar_ordenado(df):
+    _ORDENADOS[id(df)] = df
+    return df
+
+
+def dia_desde_fecha(fechas):
+    """Serie de datetime.date -> arreglo int32 de días desde 1970-01-01."""
+    return fechas.to_numpy().astype("datetime64[D]").astype(np.int64).astype(np.int32)
+
+
+def fecha_desde_dia(dias):
+    """Inverso de dia_desde_fecha: arreglo de datetime.date."""
+    return np.asarray(dias, dtype=np.int64).astype("datetime64[D]").astype(object)
+
+
+def indexar_por_fecha(df, fuente):
+    """Ordena de forma estable por "dia" (int32). Marca el frame con la fuente
+       para que process_* no lo vuelva a parsear."""
+
+    dias = df["dia"].to_numpy().astype(np.int32)
+    orden = np.argsort(dias, kind="stable")
+
+    df = df.iloc[orden].reset_index(drop=True)
+    df["dia"] = dias[orden]
+    df.attrs["fuente"] = fuente
+    return marcar_ordenado(df)
+
+
+def es_indexado(df, fuente=None):
+    """Fuente preparada: marcada por indexar_por_fecha y con "dia" ordenado.
+       La marca sola no basta, porque pandas copia attrs a frames derivados;
+       el orden se verifica una vez por frame y queda registrado."""
+
+    if df is None or "fuente" not in df.attrs or "dia" not in df.columns:
+        return False
+    if fuente is not None and df.attrs["fuente"] != fuente:
+        return False
+    if _ORDENADOS.get(id(df)) is df:
+        return True
+    if df["dia"].is_monotonic_increasing:
+        marcar_ordenado(df)
+        return True
+    return False
+
+
+def fuente_preparada(df, fuente, cols):
+    """Si df viene de preparar_* (marcado con la fuente), lo devuelve indexado,
+       re-ordenándolo si hace falta. Devuelve None para datos crudos."""
+
+    if df is None or df.attrs.get("fuente") != fuente:
+        return None
+
+    faltan = [c for c in cols if c not in df.columns]
+    if faltan:
+        raise ValueError(f"Fuente {fuente} preparada sin columnas: {', '.join(faltan)}")
+
+    if es_indexado(df, fuente):
+        return df
+    return indexar_por_fecha(df[cols], fuente)
+
+
+def agregado(out, cols):
+    """Salida de process_*: "fecha" desde "dia", agente como texto y sin attrs."""
+
+    out.insert(1, "fecha", fecha_desde_dia(out.pop("dia")))
+
+    if isinstance(out["agente"].dtype, pd.CategoricalDtype):
+        # Fuente leída desde disco (diccionario): mismo tipo y orden que en RAM
+        out["agente"] = out["agente"].astype(str)
+        out = out.sort_values(["agente","fecha"], ignore_index=True)
+
+    out.attrs = {}
+    return out[cols] if not out.empty else empty_df(cols)
+
+
+def rango_fechas(df, d_from, d_to):
+    """Corte [d_from, d_to] por búsqueda binaria sobre "dia" (sin máscara)."""
+
+    dias = df["dia"].to_numpy()
+    ini = np.searchsorted(dias, dia_ordinal(d_from), side="left")
+    fin = np.searchsorted(dias, dia_ordinal(d_to), side="right")
+    return marcar_ordenado(df.iloc[ini:fin])
+
+
+
 # =========================================================
 #   VENTAS — createdAt_local (ISO)
 # =========================================================
 
-def process_ventas(df, d_from, d_to):
+VENTAS_COLS = [
+    "agente","fecha",
+    "Ventas_Totales","Ventas_Compartidas","Ventas_Exclusivas"
+]
 
-    base_cols = [
-        "agente","fecha",
-        "Ventas_Totales","Ventas_Compartidas","Ventas_Exclusivas"
-    ]
+
+# Columnas de la fuente preparada
+VENTAS_FUENTE_COLS = [
+    "agente","dia",
+    "Ventas_Totales","Ventas_Compartidas","Ventas_Exclusivas"
+]
+
+
+def filas_ventas(df):
+    """Columnas derivadas fila a fila (sin ordenar). Sirve para la fuente
+       completa o para un bloque de filas."""
 
     if df is None or df.empty:
-        return empty_df(base_cols)
+        return empty_df(VENTAS_FUENTE_COLS)
 
     df = normalize_headers(df.copy())
 
     if "createdAt_local" not in df.columns or "ds_agent_email" not in df.columns:
-        return empty_df(base_cols)
+        return empty_df(VENTAS_FUENTE_COLS)
 
     df["fecha"] = pd.to_datetime(df["createdAt_local"], errors="coerce").dt.date
     df = df[df["fecha"].notna()]
-    df = df[(df["fecha"] >= d_from) & (df["fecha"] <= d_to)]
-    if df.empty:
-        return empty_df(base_cols)
+    df["dia"] = dia_desde_fecha(df["fecha"])
 
     df["agente"] = df["ds_agent_email"].astype(str).str.lower().str.strip()
 
@@ -131,11 +245,29 @@ def process_ventas(df, d_from, d_to):
         0
     )
 
-    out = df.groupby(["agente","fecha"], as_index=False)[
+    return df[VENTAS_FUENTE_COLS]
+
+
+def preparar_ventas(df):
+
+    preparada = fuente_preparada(df, "ventas", VENTAS_FUENTE_COLS)
+    if preparada is not None:
+        return preparada
+
+    return indexar_por_fecha(filas_ventas(df), "ventas")
+
+
+def process_ventas(df, d_from, d_to):
+
+    df = rango_fechas(preparar_ventas(df), d_from, d_to)
+    if df.empty:
+        return empty_df(VENTAS_COLS)
+
+    out = df.groupby(["agente","dia"], as_index=False, observed=True)[
         ["Ventas_Totales","Ventas_Compartidas","Ventas_Exclusivas"]
     ].sum()
 
-    return out if not out.empty else empty_df(base_cols)
+    return agregado(out, VENTAS_COLS)
 
 
 
@@ -143,35 +275,42 @@ def process_ventas(df, d_from, d_to):
 #   PERFORMANCE — Fecha de Referencia (MM/DD/YYYY)
 # =========================================================
 
-def process_performance(df, d_from, d_to):
+PERFORMANCE_COLS = [
+    "agente","fecha",
+    "Q_Encuestas","CSAT","NPS",
+    "FIRT","%FIRT","FURT","%FURT",
+    "Q_Reopen","Q_Tickets","Q_Tickets_Resueltos"
+]
+
+# Columnas de la fuente preparada (antes de renombrar)
+PERFORMANCE_FUENTE_COLS = [
+    "agente","dia",
+    "Q_Encuestas","CSAT","NPS Score",
+    "Firt (h)","% Firt","Furt (h)","% Furt",
+    "Q_Reopen","Q_Tickets","Q_Tickets_Resueltos"
+]
 
-    base_cols = [
-        "agente","fecha",
-        "Q_Encuestas","CSAT","NPS",
-        "FIRT","%FIRT","FURT","%FURT",
-        "Q_Reopen","Q_Tickets","Q_Tickets_Resueltos"
-    ]
+
+def filas_performance(df):
 
     if df is None or df.empty:
-        return empty_df(base_cols)
+        return empty_df(PERFORMANCE_FUENTE_COLS)
 
     df = normalize_headers(df.copy())
 
     if "Fecha de Referencia" not in df.columns or "Assignee Email" not in df.columns:
-        return empty_df(base_cols)
+        return empty_df(PERFORMANCE_FUENTE_COLS)
 
     df["fecha"] = pd.to_datetime(df["Fecha de Referencia"], errors="coerce").dt.date
     df = df[df["fecha"].notna()]
-    df = df[(df["fecha"] >= d_from) & (df["fecha"] <= d_to)]
-    if df.empty:
-        return empty_df(base_cols)
+    df["dia"] = dia_desde_fecha(df["fecha"])
 
     df["agente"] = df["Assignee Email"].astype(str).str.lower().str.strip()
 
-    df["Q_Encuestas"] = df.apply(
-        lambda x: 1 if (not pd.isna(x.get("CSAT")) or not pd.isna(x.get("NPS Score"))) else 0,
-        axis=1
-    )
+    # Encuesta = tiene CSAT o NPS (valor crudo no nulo)
+    csat = df["CSAT"] if "CSAT" in df.columns else pd.Series(np.nan, index=df.index)
+    nps = df["NPS Score"] if "NPS Score" in df.columns else pd.Series(np.nan, index=df.index)
+    df["Q_Encuestas"] = (csat.notna() | nps.notna()).astype(int)
 
     df["Q_Tickets"] = 1
     status = df["Status"].astype(str).str.lower().str.strip()
@@ -182,7 +321,25 @@ def process_performance(df, d_from, d_to):
     for c in ["CSAT","NPS Score","Firt (h)","% Firt","Furt (h)","% Furt"]:
         df[c] = pd.to_numeric(df.get(c, np.nan), errors="coerce")
 
-    agg = df.groupby(["agente","fecha"], as_index=False).agg({
+    return df[PERFORMANCE_FUENTE_COLS]
+
+
+def preparar_performance(df):
+
+    preparada = fuente_preparada(df, "performance", PERFORMANCE_FUENTE_COLS)
+    if preparada is not None:
+        return preparada
+
+    return indexar_por_fecha(filas_performance(df), "performance")
+
+
+def process_performance(df, d_from, d_to):
+
+    df = rango_fechas(preparar_performance(df), d_from, d_to)
+    if df.empty:
+        return empty_df(PERFORMANCE_COLS)
+
+    agg = df.groupby(["agente","dia"], as_index=False, observed=True).agg({
         "Q_Encuestas":"sum",
         "CSAT":"mean",
         "NPS Score":"mean",
@@ -203,18 +360,21 @@ def process_performance(df, d_from, d_to):
         "% Furt":"%FURT"
     })
 
-    return agg if not agg.empty else empty_df(base_cols)
+    return agregado(agg, PERFORMANCE_COLS)
 
 # =========================================================
 #   AUDITORÍAS — Date Time (DD-MM-YYYY / DD/MM/YYYY)
 # =========================================================
 
-def process_auditorias(df, d_from, d_to):
+AUDITORIAS_COLS = ["agente","fecha","Q_Auditorias","Nota_Auditorias"]
+
+AUDITORIAS_FUENTE_COLS = ["agente","dia","Q_Auditorias","Nota_Auditorias"]
 
-    base_cols = ["agente","fecha","Q_Auditorias","Nota_Auditorias"]
+
+def filas_auditorias(df):
 
     if df is None or df.empty:
-        return empty_df(base_cols)
+        return empty_df(AUDITORIAS_FUENTE_COLS)
 
     df = normalize_headers(df.copy())
 
@@ -224,20 +384,16 @@ def process_auditorias(df, d_from, d_to):
             fecha_col = c
             break
 
-    if fecha_col is None or "Audited Agent" not in df.columns:
-        return empty_df(base_cols)
+    if (fecha_col is None or "Audited Agent" not in df.columns
+            or "Total Audit Score" not in df.columns):
+        return empty_df(AUDITORIAS_FUENTE_COLS)
 
     df["fecha"] = df[fecha_col].apply(to_date)
     df = df[df["fecha"].notna()]
-    df = df[(df["fecha"] >= d_from) & (df["fecha"] <= d_to)]
-    if df.empty:
-        return empty_df(base_cols)
+    df["dia"] = dia_desde_fecha(df["fecha"])
 
     df["agente"] = df["Audited Agent"].astype(str).str.lower().str.strip()
 
-    if "Total Audit Score" not in df.columns:
-        return empty_df(base_cols)
-
     score_raw = (
         df["Total Audit Score"]
         .astype(str)
@@ -249,12 +405,30 @@ def process_auditorias(df, d_from, d_to):
     df["Nota_Auditorias"] = pd.to_numeric(score_raw, errors="coerce").fillna(0)
     df["Q_Auditorias"] = 1
 
-    agg = df.groupby(["agente","fecha"], as_index=False).agg({
+    return df[AUDITORIAS_FUENTE_COLS]
+
+
+def preparar_auditorias(df):
+
+    preparada = fuente_preparada(df, "auditorias", AUDITORIAS_FUENTE_COLS)
+    if preparada is not None:
+        return preparada
+
+    return indexar_por_fecha(filas_auditorias(df), "auditorias")
+
+
+def process_auditorias(df, d_from, d_to):
+
+    df = rango_fechas(preparar_auditorias(df), d_from, d_to)
+    if df.empty:
+        return empty_df(AUDITORIAS_COLS)
+
+    agg = df.groupby(["agente","dia"], as_index=False, observed=True).agg({
         "Q_Auditorias":"sum",
         "Nota_Auditorias":"mean"
     })
 
-    return agg if not agg.empty else empty_df(base_cols)
+    return agregado(agg, AUDITORIAS_COLS)
 
 
 
@@ -411,26 +585,65 @@ def build_weekly(df_daily):
 #   RESUMEN — Supervisor → agentes
 # =========================================================
 
+RESUMEN_COLS = [
+    "Tipo Registro","Supervisor",
+    "Nombre","Primer Apellido","Segundo Apellido","Email Cabify",
+    "Correo Supervisor","Tipo contrato","Ingreso",
+    "Q_Encuestas","CSAT","NPS","FIRT","%FIRT","FURT","%FURT",
+    "Q_Auditorias","Nota_Auditorias",
+    "Q_Tickets","Q_Tickets_Resueltos","Q_Reopen",
+    "Ventas_Totales","Ventas_Compartidas","Ventas_Exclusivas"
+]
+
+
+def w(vals, weights):
+    vals = pd.to_numeric(vals, errors="coerce")
+    weights = pd.to_numeric(weights, errors="coerce")
+    if weights.sum() == 0:
+        return np.nan
+    return (vals * weights).sum() / weights.sum()
+
+
+# Indicador ponderado -> columna de peso
+PONDERADOS = {
+    "CSAT":"Q_Encuestas",
+    "NPS":"Q_Encuestas",
+    "FIRT":"Q_Tickets_Resueltos",
+    "%FIRT":"Q_Tickets_Resueltos",
+    "FURT":"Q_Tickets_Resueltos",
+    "%FURT":"Q_Tickets_Resueltos",
+    "Nota_Auditorias":"Q_Auditorias",
+}
+
+SUMADOS = [
+    "Q_Encuestas","Q_Tickets","Q_Tickets_Resueltos","Q_Reopen","Q_Auditorias",
+    "Ventas_Totales","Ventas_Compartidas","Ventas_Exclusivas"
+]
+
+
 def build_summary(df_daily):
 
     if df_daily.empty:
-        return empty_df([
-            "Tipo Registro","Supervisor",
-            "Nombre","Primer Apellido","Segundo Apellido","Email Cabify",
-            "Correo Supervisor","Tipo contrato","Ingreso",
-            "Q_Encuestas","CSAT","NPS","FIRT","%FIRT","FURT","%FURT",
-            "Q_Auditorias","Nota_Auditorias",
-            "Q_Tickets","Q_Tickets_Resueltos","Q_Reopen",
-            "Ventas_Totales","Ventas_Compartidas","Ventas_Exclusivas"
-        ])
+        return empty_df(RESUMEN_COLS)
+
+    resumen_ag = resumen_agentes(df_daily)
+    df_sup = totales_supervisor(parciales_supervisor(resumen_ag))
+
+    df_agents = resumen_ag.copy()
+    df_agents.insert(0, "Tipo Registro", "")
+
+    final = pd.concat([df_sup, df_agents], ignore_index=True)
+
+    return final[RESUMEN_COLS]
+
+
+def resumen_agentes(df_daily):
+    """Una fila por agente. Solo depende de las filas del propio agente,
+       por lo que puede calcularse por separado en cada shard."""
 
     df = df_daily.copy()
 
-    agg_sum = {
-        "Q_Encuestas":"sum","Q_Tickets":"sum","Q_Tickets_Resueltos":"sum",
-        "Q_Reopen":"sum","Q_Auditorias":"sum",
-        "Ventas_Totales":"sum","Ventas_Compartidas":"sum","Ventas_Exclusivas":"sum"
-    }
+    agg_sum = {c:"sum" for c in SUMADOS}
 
     resumen_ag = df.groupby("Email Cabify", as_index=False).agg(agg_sum)
 
@@ -443,99 +656,281 @@ def build_summary(df_daily):
         df[info_cols].drop_duplicates(), on="Email Cabify", how="left"
     )
 
-    def w(vals, weights):
-        vals = pd.to_numeric(vals, errors="coerce")
-        weights = pd.to_numeric(weights, errors="coerce")
-        if weights.sum() == 0:
-            return np.nan
-        return (vals * weights).sum() / weights.sum()
-
     registros = []
     for ag in resumen_ag["Email Cabify"]:
         temp = df[df["Email Cabify"] == ag]
-        registros.append({
-            "Email Cabify": ag,
-            "NPS": w(temp["NPS"], temp["Q_Encuestas"]),
-            "CSAT": w(temp["CSAT"], temp["Q_Encuestas"]),
-            "FIRT": w(temp["FIRT"], temp["Q_Tickets_Resueltos"]),
-            "%FIRT": w(temp["%FIRT"], temp["Q_Tickets_Resueltos"]),
-            "FURT": w(temp["FURT"], temp["Q_Tickets_Resueltos"]),
-            "%FURT": w(temp["%FURT"], temp["Q_Tickets_Resueltos"]),
-            "Nota_Auditorias": w(temp["Nota_Auditorias"], temp["Q_Auditorias"]),
-        })
-
-    resumen_ag = resumen_ag.merge(pd.DataFrame(registros), on="Email Cabify", how="left")
-
-    for c in ["NPS","CSAT","FIRT","%FIRT","FURT","%FURT","Nota_Auditorias"]:
+        registro = {"Email Cabify": ag}
+        for c, peso in PONDERADOS.items():
+            registro[c] = w(temp[c], temp[peso])
+        registros.append(registro)
+
+    resumen_ag = resumen_ag.merge(
+        pd.DataFrame(registros, columns=["Email Cabify"] + list(PONDERADOS)),
+        on="Email Cabify", how="left"
+    )
+
+    for c in PONDERADOS:
         resumen_ag[c] = pd.to_numeric(resumen_ag[c], errors="coerce").round(2)
 
-    supervisors = resumen_ag["Supervisor"].dropna().unique().tolist()
-    registros_sup = []
+    return resumen_ag
+
+
+def parciales_supervisor(resumen_ag):
+    """Sumas parciales por supervisor (totales, valor*peso y peso).
+       Las sumas de varios shards se combinan sumándolas."""
+
+    cols = (
+        ["Supervisor","Correo Supervisor"] + SUMADOS
+        + [f"{c}__vw" for c in PONDERADOS] + [f"{c}__w" for c in PONDERADOS]
+    )
+
+    df = resumen_ag[resumen_ag["Supervisor"].notna()]
+    if df.empty:
+        return empty_df(cols)
+
+    df = df.copy()
+    for c, peso in PONDERADOS.items():
+        vals = pd.to_numeric(df[c], errors="coerce")
+        pesos = pd.to_numeric(df[peso], errors="coerce")
+        df[f"{c}__vw"] = vals * pesos
+        df[f"{c}__w"] = pesos
+
+    agg = {c:"sum" for c in cols[2:]}
+    agg["Correo Supervisor"] = "first"
+
+    parciales = df.groupby("Supervisor", as_index=False, sort=False).agg(agg)
+    return parciales[cols]
+
+
+def totales_supervisor(parciales):
+    """Filas TOTAL SUPERVISOR a partir de sumas parciales (de uno o varios shards)."""
 
-    for sup in supervisors:
-        temp = resumen_ag[resumen_ag["Supervisor"] == sup]
+    if parciales.empty:
+        return empty_df(RESUMEN_COLS)
 
-        registros_sup.append({
+    agg = {c:"sum" for c in parciales.columns if c not in ("Supervisor","Correo Supervisor")}
+    agg["Correo Supervisor"] = "first"
+    parciales = parciales.groupby("Supervisor", as_index=False, sort=False).agg(agg)
+
+    registros_sup = []
+
+    for _, fila in parciales.iterrows():
+        registro = {
             "Tipo Registro":"TOTAL SUPERVISOR",
-            "Supervisor": sup,
+            "Supervisor": fila["Supervisor"],
             "Nombre": "",
             "Primer Apellido":"",
             "Segundo Apellido":"",
             "Email Cabify":"",
-            "Correo Supervisor": temp["Correo Supervisor"].iloc[0],
+            "Correo Supervisor": fila["Correo Supervisor"],
             "Tipo contrato":"",
             "Ingreso":"",
-            "Q_Encuestas": temp["Q_Encuestas"].sum(),
-            "CSAT": w(temp["CSAT"], temp["Q_Encuestas"]),
-            "NPS": w(temp["NPS"], temp["Q_Encuestas"]),
-            "FIRT": w(temp["FIRT"], temp["Q_Tickets_Resueltos"]),
-            "%FIRT": w(temp["%FIRT"], temp["Q_Tickets_Resueltos"]),
-            "FURT": w(temp["FURT"], temp["Q_Tickets_Resueltos"]),
-            "%FURT": w(temp["%FURT"], temp["Q_Tickets_Resueltos"]),
-            "Q_Auditorias": temp["Q_Auditorias"].sum(),
-            "Nota_Auditorias": w(temp["Nota_Auditorias"], temp["Q_Auditorias"]),
-            "Q_Tickets": temp["Q_Tickets"].sum(),
-            "Q_Tickets_Resueltos": temp["Q_Tickets_Resueltos"].sum(),
-            "Q_Reopen": temp["Q_Reopen"].sum(),
-            "Ventas_Totales": temp["Ventas_Totales"].sum(),
-            "Ventas_Compartidas": temp["Ventas_Compartidas"].sum(),
-            "Ventas_Exclusivas": temp["Ventas_Exclusivas"].sum(),
-        })
-
-    df_sup = pd.DataFrame(registros_sup)
+        }
+        for c in SUMADOS:
+            registro[c] = fila[c]
+        for c in PONDERADOS:
+            registro[c] = fila[f"{c}__vw"] / fila[f"{c}__w"] if fila[f"{c}__w"] != 0 else np.nan
+        registros_sup.append(registro)
 
-    df_agents = resumen_ag.copy()
-    df_agents.insert(0, "Tipo Registro", "")
+    return pd.DataFrame(registros_sup)[RESUMEN_COLS]
 
-    final = pd.concat([df_sup, df_agents], ignore_index=True)
 
-    final_cols = [
-        "Tipo Registro","Supervisor",
-        "Nombre","Primer Apellido","Segundo Apellido","Email Cabify",
-        "Correo Supervisor","Tipo contrato","Ingreso",
-        "Q_Encuestas","CSAT","NPS","FIRT","%FIRT","FURT","%FURT",
-        "Q_Auditorias","Nota_Auditorias",
-        "Q_Tickets","Q_Tickets_Resueltos","Q_Reopen",
-        "Ventas_Totales","Ventas_Compartidas","Ventas_Exclusivas"
-    ]
+# =========================================================
+#   MODO PARALELO — shards por agente
+# =========================================================
 
-    return final[final_cols]
+# Columna de agente de cada fuente cruda
+AGENTE_COLS = {
+    "ventas":"ds_agent_email",
+    "performance":"Assignee Email",
+    "auditorias":"Audited Agent",
+}
 
 
+def filas_por_shard(df, col, n_shards):
+    """Posiciones de las filas de cada shard, según un hash estable del email
+       normalizado. Todas las filas de un agente quedan en el mismo shard.
 
-# =========================================================
-#   FUNCIÓN PRINCIPAL
-# =========================================================
+       No copia la fuente: se normalizan y hashean solo los emails distintos
+       y el resultado vuelve a cada fila por su código de factorize."""
+
+    if es_indexado(df):
+        # Fuente ya preparada: el email normalizado está en "agente"
+        agente = df["agente"]
+    else:
+        nombres = normalize_headers(pd.DataFrame(columns=df.columns)).columns
+        pos = np.flatnonzero(nombres == col)
+        if not len(pos):
+            return [np.empty(0, dtype=np.intp)] * n_shards
+        agente = df.iloc[:, pos[0]]
+
+    codigos, unicos = pd.factorize(agente, use_na_sentinel=False)
+    if not es_indexado(df):
+        unicos = pd.Index(unicos).astype(str).str.lower().str.strip()
+    hashes = pd.util.hash_array(np.asarray(unicos, dtype=object)) % n_shards
+
+    shard = hashes[codigos].astype(np.intp)
+    # Orden estable: cada shard conserva el orden original (por fecha si
+    # la fuente está indexada)
+    orden = np.argsort(shard, kind="stable")
+    cortes = np.cumsum(np.bincount(shard, minlength=n_shards))[:-1]
+    return np.split(orden, cortes)
+
+
+def tomar_shard(df, filas):
+    if df is None or df.empty:
+        return df
+    shard = df.take(filas)
+    return marcar_ordenado(shard) if es_indexado(df) else shard
 
-def procesar_reportes(df_ventas, df_perf, df_aud, agentes_df, d_from, d_to):
+
+def shard_por_agente(df, col, n_shards):
+    """Reparte las filas en n_shards por agente (ver filas_por_shard)."""
+
+    if df is None or df.empty:
+        return [df] * n_shards
+
+    return [tomar_shard(df, filas) for filas in filas_por_shard(df, col, n_shards)]
+
+
+def procesar_shard(df_ventas, df_perf, df_aud, agentes_df, d_from, d_to,
+                   devolver_agregados=False):
+    """Parseo, agregación y cruce con agentes de un solo shard.
+       Devuelve los agregados por fuente (solo si devolver_agregados, para
+       el spill), el diario del shard, sus filas de resumen por agente y
+       las sumas parciales por supervisor."""
 
     ventas = process_ventas(df_ventas, d_from, d_to)
     perf   = process_performance(df_perf, d_from, d_to)
     auds   = process_auditorias(df_aud, d_from, d_to)
 
-    diario  = build_daily([ventas, perf, auds], agentes_df)
-    semanal = build_weekly(diario)
-    resumen = build_summary(diario)
+    diario = build_daily([ventas, perf, auds], agentes_df)
+    agregados = (ventas, perf, auds) if devolver_agregados else None
+    if diario.empty:
+        return agregados, diario, None, None
+
+    resumen_ag = resumen_agentes(diario)
+    return agregados, diario, resumen_ag, parciales_supervisor(resumen_ag)
+
+
+# Fuentes y cortes por shard que heredan los workers con fork
+_COMPARTIDO = {}
+
+
+def procesar_shard_compartido(i, agentes_df, d_from, d_to, devolver_agregados=False):
+    """procesar_shard sobre el shard i de las fuentes heredadas del padre."""
+
+    return procesar_shard(
+        *[df if filas is None else tomar_shard(df, filas[i])
+          for df, filas in _COMPARTIDO["fuentes"]],
+        agentes_df, d_from, d_to, devolver_agregados
+    )
+
+
+def procesar_reportes_paralelo(df_ventas, df_perf, df_aud, agentes_df, d_from, d_to,
+                               n_shards=None, max_workers=None,
+                               spill_dir=None, memoria_mb=None):
+    """Igual que procesar_reportes, pero repartiendo las filas por agente en
+       n_shards procesados en un pool de procesos.
+
+       El diario se arma concatenando los shards (cada uno ordenado por
+       fecha/agente internamente, sin re-ordenar el total). Los totales por
+       supervisor se combinan desde las sumas parciales de cada shard.
+
+       El padre solo calcula qué filas van a cada shard. Donde existe fork
+       los workers heredan las fuentes y arman su shard ahí mismo; si no,
+       cada shard se serializa hacia su worker.
+
+       Con spill_dir se escriben las mismas etapas que en modo serial salvo
+       las fuente_*: las fuentes preparadas viven dentro de cada worker."""
+
+    n_shards = n_shards or os.cpu_count() or 1
+    spill = nuevo_spill(spill_dir, memoria_mb)
+
+    # Fuentes ya preparadas: se re-indexan si hace falta y solo el rango
+    # pedido viaja a los workers
+    df_ventas, df_perf, df_aud = [
+        rango_fechas(preparar(df), d_from, d_to) if df is not None and "fuente" in df.attrs else df
+        for preparar, df in (
+            (preparar_ventas, df_ventas),
+            (preparar_performance, df_perf),
+            (preparar_auditorias, df_aud),
+        )
+    ]
+
+    fuentes = [
+        (df, filas_por_shard(df, AGENTE_COLS[nombre], n_shards)
+             if df is not None and not df.empty else None)
+        for nombre, df in (
+            ("ventas", df_ventas),
+            ("performance", df_perf),
+            ("auditorias", df_aud),
+        )
+    ]
+    devolver_agregados = spill is not None
+
+    if "fork" in mp.get_all_start_methods():
+        # Los workers heredan las fuentes y los cortes al hacer fork:
+        # nada de eso se serializa, cada uno arma su shard
+        _COMPARTIDO["fuentes"] = fuentes
+        contexto = mp.get_context("fork")
+    else:
+        contexto = None
+
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers or n_shards,
+                                 mp_context=contexto) as pool:
+            if contexto is not None:
+                futuros = [
+                    pool.submit(
+                        procesar_shard_compartido,
+                        i, agentes_df, d_from, d_to, devolver_agregados
+                    )
+                    for i in range(n_shards)
+                ]
+            else:
+                futuros = [
+                    pool.submit(
+                        procesar_shard,
+                        *[df if filas is None else tomar_shard(df, filas[i])
+                          for df, filas in fuentes],
+                        agentes_df, d_from, d_to, devolver_agregados
+                    )
+                    for i in range(n_shards)
+                ]
+            resultados = [f.result() for f in futuros]
+    finally:
+        _COMPARTIDO.clear()
+    del fuentes
+
+    if spill is not None:
+        for i, nombre in enumerate(("ventas", "performance", "auditorias")):
+            spill_etapa(nombre, spill, lambda: pd.concat([r[0][i] for r in resultados], ignore_index=True))
+            liberar_etapa(spill, nombre)
+
+    diarios = [r[1] for r in resultados if not r[1].empty]
+    if not diarios:
+        diario = spill_etapa("diario", spill, lambda: build_daily([], agentes_df))
+        return {
+            "diario": diario,
+            "semanal": spill_etapa("semanal", spill, lambda: build_weekly(diario)),
+            "resumen": spill_etapa("resumen", spill, lambda: build_summary(diario))
+        }
+
+    diario = spill_etapa("diario", spill, lambda: pd.concat(diarios, ignore_index=True))
+    del diarios
+    semanal = spill_etapa("semanal", spill, lambda: build_weekly(diario))
+
+    df_agents = pd.concat([r[2] for r in resultados if r[2] is not None], ignore_index=True)
+    df_agents.insert(0, "Tipo Registro", "")
+
+    df_sup = totales_supervisor(
+        pd.concat([r[3] for r in resultados if r[3] is not None], ignore_index=True)
+    )
+
+    resumen = spill_etapa(
+        "resumen", spill, lambda: pd.concat([df_sup, df_agents], ignore_index=True)[RESUMEN_COLS]
+    )
 
     return {
         "diario": diario,
@@ -543,3 +938,292 @@ def procesar_reportes(df_ventas, df_perf, df_aud, agentes_df, d_from, d_to):
         "resumen": resumen
     }
 
+
+
+# =========================================================
+#   SPILL — intermedios en Arrow IPC (memory-mapped)
+# =========================================================
+
+# Archivos que escribe una ejecución con spill_dir
+ETAPAS = [
+    "fuente_ventas","fuente_performance","fuente_auditorias",
+    "ventas","performance","auditorias",
+    "diario","semanal","resumen"
+]
+
+# Filas por bloque al preparar una fuente cuando no hay presupuesto
+FILAS_POR_BLOQUE = 100_000
+
+# Columna auxiliar con el tipo de cada valor de una columna mezclada
+SUFIJO_TIPO = "::tipo"
+
+# Columna auxiliar con el índice, si no es el 0..n-1 por defecto
+COL_INDICE = "::indice"
+
+
+def nuevo_spill(spill_dir, memoria_mb=None):
+    """Estado del modo spill. Con memoria_mb=None todas las etapas se bajan a disco.
+
+       El presupuesto cubre las etapas que quedan en RAM y el tamaño de los
+       bloques con que se preparan las fuentes (la copia de trabajo de
+       preparar_*). No incluye los DataFrames de entrada: son del llamador."""
+
+    if spill_dir is None:
+        return None
+
+    os.makedirs(spill_dir, exist_ok=True)
+
+    # Sin archivos de una ejecución anterior que puedan leerse como actuales
+    for nombre in ETAPAS:
+        if os.path.exists(ruta_etapa(spill_dir, nombre)):
+            os.remove(ruta_etapa(spill_dir, nombre))
+
+    return {
+        "dir": spill_dir,
+        "presupuesto": None if memoria_mb is None else memoria_mb * 1024 * 1024,
+        "en_ram": {},
+    }
+
+
+def ruta_etapa(spill_dir, nombre):
+    return os.path.join(spill_dir, f"{nombre}.arrow")
+
+
+def escribir_arrow(tabla, ruta):
+    with pa.OSFile(ruta, "wb") as sink:
+        with pa.ipc.new_file(sink, tabla.schema) as writer:
+            writer.write_table(tabla)
+
+
+def leer_arrow(ruta):
+    return pa.ipc.open_file(pa.memory_map(ruta, "r")).read_all()
+
+
+def codificar_valor(x):
+    """(texto, tipo) de un valor de una columna con tipos mezclados."""
+
+    if x is None:
+        return None, "none"
+    if x is pd.NaT:
+        return None, "NaT"
+    if isinstance(x, pd.Timestamp):
+        return x.isoformat(), "Timestamp"
+    if isinstance(x, datetime):
+        return x.isoformat(), "datetime"
+    if isinstance(x, date):
+        return x.isoformat(), "date"
+    if isinstance(x, (bool, np.bool_)):
+        return str(bool(x)), "bool"
+    if isinstance(x, (int, np.integer)):
+        return str(int(x)), "int"
+    if isinstance(x, (float, np.floating)):
+        return repr(float(x)), "float"
+    return str(x), "str"
+
+
+DECODIFICAR = {
+    "none": lambda s: None,
+    "NaT": lambda s: pd.NaT,
+    "Timestamp": pd.Timestamp,
+    "datetime": datetime.fromisoformat,
+    "date": date.fromisoformat,
+    "bool": lambda s: s == "True",
+    "int": int,
+    "float": float,
+    "str": str,
+}
+
+
+def tabla_arrow(df):
+    """Convierte a Arrow columna por columna, con los textos como diccionario
+       (lectura mapeada sin copiar los strings). Las columnas object con tipos
+       mezclados (p.ej. "Ingreso" con "" y Timestamps) se guardan como texto
+       más el tipo de cada valor. Los dtypes y attrs originales van en la
+       metadata para que cargar_etapa devuelva el mismo DataFrame."""
+
+    columnas = {}
+    mixtas = []
+    for c in df.columns:
+        try:
+            # Floats con NaN como valor (no como nulo): la lectura no necesita copia
+            arr = pa.array(df[c], from_pandas=not pd.api.types.is_float_dtype(df[c]))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            textos, tipos = zip(*map(codificar_valor, df[c])) if len(df) else ((), ())
+            columnas[c] = pa.array(textos, type=pa.string())
+            columnas[f"{c}{SUFIJO_TIPO}"] = pa.array(tipos, type=pa.string()).dictionary_encode()
+            mixtas.append(c)
+            continue
+        if pa.types.is_string(arr.type) or pa.types.is_large_string(arr.type):
+            arr = arr.dictionary_encode()
+        columnas[c] = arr
+
+    if not df.index.equals(pd.RangeIndex(len(df))):
+        columnas[COL_INDICE] = pa.array(df.index.to_numpy())
+
+    return pa.table(columnas).replace_schema_metadata({
+        "attrs": json.dumps(df.attrs),
+        "tipos": json.dumps({c: str(df[c].dtype) for c in df.columns}),
+        "mixtas": json.dumps(mixtas),
+    })
+
+
+def cargar_etapa(spill_dir, nombre):
+    """Lee una etapa guardada, mapeada en memoria; sirve para inspección o
+       para re-ejecutar etapas posteriores (p.ej. build_weekly(cargar_etapa(d, "diario"))
+       o process_ventas(cargar_etapa(d, "fuente_ventas"), ...)).
+
+       Las etapas escritas desde un DataFrame vuelven con sus dtypes originales.
+       Las fuente_* quedan con "agente" como categoría: sus columnas apuntan
+       directo al archivo."""
+
+    tabla = leer_arrow(ruta_etapa(spill_dir, nombre))
+    meta = {k.decode(): json.loads(v) for k, v in (tabla.schema.metadata or {}).items()}
+    df = tabla.to_pandas(split_blocks=True, self_destruct=True)
+    del tabla
+
+    if COL_INDICE in df.columns:
+        df.index = pd.Index(df.pop(COL_INDICE).to_numpy())
+
+    for c in meta.get("mixtas", []):
+        tipos = df.pop(f"{c}{SUFIJO_TIPO}")
+        df[c] = pd.Series(
+            [DECODIFICAR[t](x) for x, t in zip(df[c], tipos)], index=df.index, dtype=object
+        )
+
+    for c, tipo in meta.get("tipos", {}).items():
+        if str(df[c].dtype) != tipo:
+            df[c] = df[c].astype(tipo)
+
+    df = df[list(meta["tipos"])] if "tipos" in meta else df
+    df.attrs = meta.get("attrs", {})
+    return df
+
+
+def spill_etapa(nombre, spill, producir):
+    """Calcula una etapa y la escribe como Arrow IPC. Si mantenerla en RAM
+       excede el presupuesto, se libera y se devuelve la versión mapeada.
+
+       producir es una función sin argumentos: así el único DataFrame en RAM
+       es el de esta función y se libera antes de leer desde disco."""
+
+    df = producir()
+    if spill is None or df is None:
+        return df
+
+    escribir_arrow(tabla_arrow(df), ruta_etapa(spill["dir"], nombre))
+
+    tamano = int(df.memory_usage(deep=True).sum())
+    presupuesto = spill["presupuesto"]
+    if presupuesto is not None and sum(spill["en_ram"].values()) + tamano <= presupuesto:
+        spill["en_ram"][nombre] = tamano
+        return df
+
+    del df
+    return cargar_etapa(spill["dir"], nombre)
+
+
+def liberar_etapa(spill, nombre):
+    """Descuenta del presupuesto una etapa que ya no se usa."""
+
+    if spill is not None:
+        spill["en_ram"].pop(nombre, None)
+
+
+def filas_por_bloque(df, spill):
+    """Bloque de filas cuya copia de trabajo en preparar_* cabe en el presupuesto."""
+
+    if spill["presupuesto"] is None:
+        return FILAS_POR_BLOQUE
+
+    muestra = df.iloc[:1000]
+    por_fila = max(1, muestra.memory_usage(deep=True).sum() / len(muestra))
+    # Copia normalizada + columnas derivadas: ~2x la fila cruda
+    return max(1000, int(spill["presupuesto"] / (2 * por_fila)))
+
+
+def preparar_en_disco(df, fuente, preparar, filas, spill):
+    """Prepara una fuente cruda por bloques de filas, cada uno escrito como IPC.
+       Luego ordena por "dia" en Arrow y deja fuente_<fuente>.arrow, mapeada."""
+
+    nombre = f"fuente_{fuente}"
+
+    # Entrada vacía o ya preparada (del llamador): no hay copia grande que evitar
+    if df is None or df.empty or "fuente" in df.attrs:
+        return spill_etapa(nombre, spill, lambda: preparar(df))
+
+    n = filas_por_bloque(df, spill)
+    bloques = []
+    for ini in range(0, len(df), n):
+        ruta = ruta_etapa(spill["dir"], f"{nombre}.{len(bloques)}")
+        escribir_arrow(tabla_arrow(filas(df.iloc[ini:ini + n])), ruta)
+        bloques.append(ruta)
+
+    tabla = pa.concat_tables(
+        [leer_arrow(ruta).replace_schema_metadata() for ruta in bloques],
+        promote_options="permissive"
+    ).unify_dictionaries()
+    tabla = tabla.replace_schema_metadata({"attrs": json.dumps({"fuente": fuente})})
+
+    # Orden por "dia" escrito de a bloques: nunca hay una copia ordenada completa
+    orden = pc.sort_indices(tabla, sort_keys=[("dia", "ascending")])
+    with pa.OSFile(ruta_etapa(spill["dir"], nombre), "wb") as sink:
+        with pa.ipc.new_file(sink, tabla.schema) as writer:
+            for ini in range(0, len(orden), n):
+                writer.write_table(tabla.take(orden[ini:ini + n]))
+    del tabla, orden
+
+    for ruta in bloques:
+        os.remove(ruta)
+    pa.default_memory_pool().release_unused()
+
+    return marcar_ordenado(cargar_etapa(spill["dir"], nombre))
+
+
+
+# =========================================================
+#   FUNCIÓN PRINCIPAL
+# =========================================================
+
+def procesar_reportes(df_ventas, df_perf, df_aud, agentes_df, d_from, d_to, n_shards=1,
+                      spill_dir=None, memoria_mb=None):
+    """Genera las hojas diario, semanal y resumen.
+
+       n_shards > 1 (o None = un shard por CPU) usa procesar_reportes_paralelo.
+       Con spill_dir, cada etapa se guarda en <spill_dir>/<etapa>.arrow (ver
+       ETAPAS) y las que no caben en memoria_mb se leen mapeadas desde disco."""
+
+    if n_shards is None or n_shards > 1:
+        return procesar_reportes_paralelo(
+            df_ventas, df_perf, df_aud, agentes_df, d_from, d_to, n_shards=n_shards,
+            spill_dir=spill_dir, memoria_mb=memoria_mb
+        )
+
+    spill = nuevo_spill(spill_dir, memoria_mb)
+
+    # Fuente preparada (nivel fila, la más grande) -> agregado por agente/fecha
+    agregados = []
+    for nombre, preparar, filas, procesar, df in (
+        ("ventas", preparar_ventas, filas_ventas, process_ventas, df_ventas),
+        ("performance", preparar_performance, filas_performance, process_performance, df_perf),
+        ("auditorias", preparar_auditorias, filas_auditorias, process_auditorias, df_aud),
+    ):
+        if spill is None:
+            fuente = preparar(df)
+        else:
+            fuente = preparar_en_disco(df, nombre, preparar, filas, spill)
+        agregados.append(spill_etapa(nombre, spill, lambda: procesar(fuente, d_from, d_to)))
+        del fuente
+
+    diario = spill_etapa("diario", spill, lambda: build_daily(agregados, agentes_df))
+    del agregados
+    for nombre in ("ventas", "performance", "auditorias"):
+        liberar_etapa(spill, nombre)
+
+    semanal = spill_etapa("semanal", spill, lambda: build_weekly(diario))
+    resumen = spill_etapa("resumen", spill, lambda: build_summary(diario))
+
+    return {
+        "diario": diario,
+        "semanal": semanal,
+        "resumen": resumen
+    }